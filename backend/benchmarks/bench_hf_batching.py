@@ -0,0 +1,93 @@
+"""
+Benchmark for the flan-t5 batching in hf_model.py
+Sends the same number of concurrent prompts through a BatchScheduler with
+different batch sizes and prints throughput and latency for each.
+
+Usage:
+    python -m backend.benchmarks.bench_hf_batching
+    python -m backend.benchmarks.bench_hf_batching --model google/flan-t5-small --batch-sizes 1,4,8
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from transformers import pipeline
+
+from backend.services import hf_model
+from backend.services.batch_scheduler import BatchScheduler
+
+CITIES = ["Berlin", "Hamburg", "Muenchen", "Koeln", "Nuernberg", "Passau", "Greifswald", "Goettingen"]
+SKIES = ["clear", "cloudy", "overcast", "fog"]
+
+
+def make_prompts(count: int) -> list:
+    # prompts that look like the ones hf_model.prompt builds
+    prompts = []
+    for i in range(count):
+        data = {}
+        for j in range(1 + i % 4):
+            city = CITIES[(i + j) % len(CITIES)]
+            data[city] = {
+                "current": {"temperature": i % 12 - 2, "feels like": i % 12 - 5, "overcast": SKIES[(i + j) % len(SKIES)]},
+                "daily_weekone": {"2026-01-05": {"mintemp": -3, "maxtemp": 4, "precipitation": "rain" if j % 2 else ""}},
+            }
+        summary = hf_model.compact_weather_summary(data)
+        prompts.append(
+            f"Weather summary: {summary}\n"
+            f"Write the weather report in German.\n"
+            f"Integrate the following hobbies into the report, one per city if possible: hiking, cycling.\n"
+            "Write exactly five sentences. Start immediately with the report.\n"
+        )
+    return prompts
+
+
+def run(generator, prompts: list, batch_size: int, wait_ms: float) -> dict:
+    scheduler = BatchScheduler(lambda: generator, max_batch_size=batch_size, max_wait_ms=wait_ms)
+    latencies = []
+
+    def call(text):
+        start = time.perf_counter()
+        scheduler.submit(text)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        list(pool.map(call, prompts))
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "batch_size": batch_size,
+        "batches": scheduler.batches_run,
+        "prompts_per_sec": len(prompts) / total,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="flan-t5 batching benchmark")
+    parser.add_argument("--model", default="google/flan-t5-large")
+    parser.add_argument("--batch-sizes", default="1,2,4,8")
+    parser.add_argument("--requests", type=int, default=32, help="concurrent prompts per run")
+    parser.add_argument("--wait-ms", type=float, default=10.0)
+    parser.add_argument("--max-length", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"Loading {args.model}...")
+    generator = pipeline(task="text2text-generation", model=args.model, max_length=args.max_length)
+    prompts = make_prompts(args.requests)
+
+    # warm up once so the first run doesn't pay for lazy initialisation
+    generator(prompts[0])
+
+    print(f"{'batch':>5} {'batches':>8} {'prompts/s':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        r = run(generator, prompts, batch_size, args.wait_ms)
+        print(f"{r['batch_size']:>5} {r['batches']:>8} {r['prompts_per_sec']:>10.2f} {r['p50_ms']:>10.0f} {r['p95_ms']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
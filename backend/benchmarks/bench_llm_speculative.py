@@ -0,0 +1,98 @@
+"""
+Benchmark for speculative (prompt lookup) decoding in llm_service.py
+Generates the same multi-city reports with greedy decoding, once with a normal
+model and once with a speculative one, then prints prefill time, decode-only
+tokens/sec, speedup, acceptance rate and whether both texts are identical
+(they should be). Speculative decoding only speeds up the decode part, the
+prompt is read the same way in both runs.
+Two model instances are needed because llama_cpp only takes the draft model
+when the model is created. Both run on the CPU unless --gpu-layers is given.
+
+Usage:
+    python -m backend.benchmarks.bench_llm_speculative
+    python -m backend.benchmarks.bench_llm_speculative --cities-per-prompt 4 --num-pred-tokens 6
+"""
+
+import argparse
+import json
+
+from backend.core import config
+from backend.services import llm_service
+
+PERSONS = ["Merkel", "Haftbefehl", "Fisch"]
+HOBBIES = [["hiking", "cycling"], ["football"], ["sailing", "photography"]]
+
+
+def load_locations() -> dict:
+    # the structured files the reports are normally built from
+    locations = {}
+    for path in sorted(config.STRUCTURED_DATA_DIR.glob("*_structured.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                locations[path.name.split("_")[0]] = json.load(f)
+        except Exception as e:
+            print(f"Skipping {path.name}: {e}")
+    return locations
+
+
+def make_prompts(locations: dict, count: int, per_prompt: int) -> list:
+    plzs = list(locations)
+    prompts = []
+    for i in range(count):
+        chosen = [plzs[(i * per_prompt + j) % len(plzs)] for j in range(per_prompt)]
+        data = {plz: locations[plz] for plz in chosen}
+        language = "de" if i % 2 == 0 else "en"
+        prompts.append(llm_service.build_prompt(data, PERSONS[i % 3], HOBBIES[i % 3], language))
+    return prompts
+
+
+def run(model, prompts: list) -> dict:
+    llm_service.reset_decode_stats()
+    texts = [llm_service.generate_text(p, temperature=0.0, model=model) for p in prompts]  # greedy
+    return {"texts": texts, **llm_service.get_decode_stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="speculative decoding benchmark")
+    parser.add_argument("--prompts", type=int, default=6)
+    parser.add_argument("--cities-per-prompt", type=int, default=3)
+    parser.add_argument("--num-pred-tokens", type=int, default=config.LLM_SPECULATIVE_NUM_PRED_TOKENS)
+    parser.add_argument("--gpu-layers", type=int, default=0, help="0 = CPU only (the default)")
+    args = parser.parse_args()
+
+    locations = load_locations()
+    if not locations:
+        print(f"No structured weather data found in {config.STRUCTURED_DATA_DIR}")
+        return
+    prompts = make_prompts(locations, args.prompts, args.cities_per_prompt)
+
+    # the app's own model (llm_service.get_llm) is never loaded here, only
+    # our two benchmark models with the wanted number of GPU layers
+    print(f"Loading both models (gpu layers: {args.gpu_layers})...")
+    greedy_model = llm_service.load_model(False, n_gpu_layers=args.gpu_layers)
+    speculative_model = llm_service.load_model(True, args.num_pred_tokens, n_gpu_layers=args.gpu_layers)
+
+    # warm up once so both runs start with a loaded model
+    for model in (greedy_model, speculative_model):
+        llm_service.generate_text(prompts[0], temperature=0.0, model=model)
+
+    baseline = run(greedy_model, prompts)
+    speculative = run(speculative_model, prompts)
+
+    identical = sum(a == b for a, b in zip(baseline["texts"], speculative["texts"]))
+    speedup = speculative["decode_tokens_per_sec"] / baseline["decode_tokens_per_sec"] if baseline["decode_tokens_per_sec"] else 0.0
+
+    def total(r):
+        return r["prefill_seconds"] + r["decode_seconds"]
+
+    print(f"{'mode':>12} {'tokens':>8} {'prefill s':>10} {'decode s':>9} {'decode t/s':>11} {'accept':>7}")
+    for name, r in (("greedy", baseline), ("speculative", speculative)):
+        print(f"{name:>12} {r['completion_tokens']:>8} {r['prefill_seconds']:>10.1f} {r['decode_seconds']:>9.1f} "
+              f"{r['decode_tokens_per_sec']:>11.2f} {r['acceptance_rate']:>7.2f}")
+    end_to_end = total(baseline) / total(speculative) if total(speculative) else 0.0
+    print(f"decode speedup: {speedup:.2f}x, end-to-end speedup: {end_to_end:.2f}x, "
+          f"identical outputs: {identical}/{len(prompts)}")
+
+
+if __name__ == "__main__":
+    main()
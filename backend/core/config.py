@@ -33,6 +33,7 @@ WEATHER_DATA_DIR = BASE_DIR / "data" / "weather"  # raw weather JSON files
 STRUCTURED_DATA_DIR = BASE_DIR / "frontend" / "public" / "structured_data"  # processed data
 SPEECH_OUTPUT_DIR = BASE_DIR / "frontend" / "public" / "speech"  # audio files (MP3)
 TEXT_OUTPUT_DIR = BASE_DIR / "frontend" / "public" / "weather_text_from_gpt"  # AI text reports
+POSTAL_CODES_FILE = BASE_DIR / "frontend" / "public" / "postal_codes" / "postal_codes.json"  # all german PLZ + city names
 
 print(f"Weather data will be saved to: {WEATHER_DATA_DIR}")
 
@@ -42,3 +43,66 @@ print(f"Weather data will be saved to: {WEATHER_DATA_DIR}")
 MODEL_PATH = os.getenv("MODEL_PATH", "hugging-quants/Llama-3.2-3B-Instruct-Q4_K_M-GGUF")
 MODEL_FILE = os.getenv("MODEL_FILE", "llama-3.2-3b-instruct-q4_k_m.gguf")
 print(f"Using AI model: {MODEL_PATH}")
+
+# flan-t5 batching settings (hf_model.py)
+# prompts that arrive close together are generated in one batch
+HF_BATCH_MAX_SIZE = int(os.getenv("HF_BATCH_MAX_SIZE", "8"))  # prompts per batch
+HF_BATCH_MAX_WAIT_MS = float(os.getenv("HF_BATCH_MAX_WAIT_MS", "10"))  # how long to wait for more prompts
+
+# Admission control settings
+# Limits how much expensive work (AI reports) one user can queue
+# so one script in a loop can't block the model for everybody
+# NOTE: ADMISSION_MAX_CONCURRENT is how many reports may run at the same time.
+# The reports are written by the Llama model (llm_service.py), which can only
+# do one at a time - more slots would only make the wait estimate too small.
+# If you switch the report path to flan-t5 (hf_model.py), raise it to
+# HF_BATCH_MAX_SIZE: with 1 slot the batcher never sees a second prompt and
+# only adds HF_BATCH_MAX_WAIT_MS of waiting. (One user still only gets
+# ADMISSION_MAX_IN_FLIGHT_PER_USER of them, batches are filled by different users.)
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "1"))  # reports running at once
+ADMISSION_MAX_IN_FLIGHT_PER_USER = int(os.getenv("ADMISSION_MAX_IN_FLIGHT_PER_USER", "1"))  # running jobs per user
+ADMISSION_MAX_QUEUED_PER_USER = int(os.getenv("ADMISSION_MAX_QUEUED_PER_USER", "5"))  # waiting jobs per user
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "120"))  # reject with 429 above this
+ADMISSION_DEFAULT_JOB_SECONDS = float(os.getenv("ADMISSION_DEFAULT_JOB_SECONDS", "30"))  # guess before we measured
+ADMISSION_USER_WEIGHT = float(os.getenv("ADMISSION_USER_WEIGHT", "1.0"))  # logged in users
+ADMISSION_ANON_WEIGHT = float(os.getenv("ADMISSION_ANON_WEIGHT", "0.5"))  # anonymous calls (by IP) get less
+ADMISSION_MAX_TRACKED_TENANTS = int(os.getenv("ADMISSION_MAX_TRACKED_TENANTS", "1000"))  # users/IPs we keep counters for
+
+# Pre-warming settings
+# After a weather refresh we generate the most popular reports while the server is idle
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_TOP_K = int(os.getenv("PREWARM_TOP_K", "10"))  # how many popular reports to pre-generate
+PREWARM_MAX_CPU_PERCENT = float(os.getenv("PREWARM_MAX_CPU_PERCENT", "50"))  # only pre-warm below this CPU load
+PREWARM_MIN_INTERVAL_SECONDS = float(os.getenv("PREWARM_MIN_INTERVAL_SECONDS", "600"))  # at most one run per 10 min
+PREWARM_HALF_LIFE_HOURS = float(os.getenv("PREWARM_HALF_LIFE_HOURS", "72"))  # old requests count half after 3 days
+PREWARM_HISTORY_MAX_SPECS = int(os.getenv("PREWARM_HISTORY_MAX_SPECS", "500"))  # size of the request log
+PREWARM_HISTORY_FILE = Path(os.getenv("PREWARM_HISTORY_FILE", str(BASE_DIR / "data" / "history" / "request_history.json")))
+PREWARM_HISTORY_SAVE_SECONDS = float(os.getenv("PREWARM_HISTORY_SAVE_SECONDS", "300"))  # write the log at most every 5 min
+PREWARM_WEIGHT = float(os.getenv("PREWARM_WEIGHT", "0.1"))  # pre-warm jobs are queued with a very low weight
+
+def _parse_hour_range(value: str, default: tuple) -> tuple:
+    # "6-10" -> (6, 10), "22-2" goes over midnight
+    # a broken value must not break every report, so we fall back to the default
+    try:
+        start, end = (int(h) for h in value.split("-"))
+        if not (0 <= start <= 23 and 0 <= end <= 24) or start == end:
+            raise ValueError("hours must be 0-24 and not the same")
+        return start, end
+    except ValueError as e:
+        print(f"Invalid hour range {value!r} ({e}), using {default[0]}-{default[1]}")
+        return default
+
+# peak hours for the hit rate report, like "6-10" = from 6:00 until 10:00
+PREWARM_PEAK_HOURS = _parse_hour_range(os.getenv("PREWARM_PEAK_HOURS", "6-10"), (6, 10))
+
+# Weather data API settings (/weather endpoints)
+WEATHER_DATA_CHECK_SECONDS = float(os.getenv("WEATHER_DATA_CHECK_SECONDS", "5"))  # how often we look for new files
+WEATHER_API_MAX_LOCATIONS = int(os.getenv("WEATHER_API_MAX_LOCATIONS", "20"))  # locations per request
+WEATHER_API_MAX_CACHED_BODIES = int(os.getenv("WEATHER_API_MAX_CACHED_BODIES", "256"))  # on-demand answers we keep
+WEATHER_API_MAX_POSTAL_RESULTS = int(os.getenv("WEATHER_API_MAX_POSTAL_RESULTS", "100"))  # results of a postal code search
+
+# Speculative decoding for the Llama model (llm_service.py)
+# The model copies lots of tokens from the prompt (cities, temperatures, dates)
+# so we guess them from the prompt and let the model check several at once
+LLM_SPECULATIVE = os.getenv("LLM_SPECULATIVE", "false").lower() == "true"
+LLM_SPECULATIVE_NUM_PRED_TOKENS = int(os.getenv("LLM_SPECULATIVE_NUM_PRED_TOKENS", "10"))  # tokens guessed per step
@@ -4,11 +4,17 @@
 # Date: January 2026
 
 # importing stuff I need
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from backend.services import weather_api
 from backend.routes import auth
+from backend.routes import weather
 from backend.services import scheduler_service as scheduler
+from backend.services import admission_service as admission
+from backend.services import prewarm_service
+from backend.services import weather_data_service
 import uvicorn
 import os
 
@@ -17,6 +23,7 @@ app = FastAPI()
 
 # add the auth router (learned this from tutorial)
 app.include_router(auth.router)
+app.include_router(weather.router)  # weather data for the frontend
 
 # CORS stuff - needed so frontend can talk to backend
 # without this nothing works lol
@@ -49,15 +56,53 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     print("Shutting down...")  # debug
+    prewarm_service.save_history(force=True)  # don't lose the request history
     scheduler.stop_scheduler()
     print("Scheduler stopped!")
 
+# wraps the expensive endpoints in the admission queue
+# logged in users are queued by user id, anonymous calls by IP
+# if the queue is too long we answer 429 right away instead of hanging
+@asynccontextmanager
+async def admitted(request: Request, current_user, kind: str):
+    client_host = request.client.host if request.client else None
+    tenant, weight = admission.tenant_for(current_user, client_host)
+    try:
+        async with admission.controller.admit(tenant, kind, weight=weight):
+            yield
+    except admission.QueueFullError as e:
+        print(f"Rejected {kind} for {tenant}: {e}")  # debug
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
 # Main endpoint - this is where the magic happens!
 # when frontend sends data, this function receives it
 @app.post("/generate-documents")
-async def generate_documents(request: Request):
+async def generate_documents(request: Request, background_tasks: BackgroundTasks, current_user=Depends(auth.get_optional_user)):
     print("\n=== NEW REQUEST RECEIVED ===")  # always good to see whats happening
     
+    async with admitted(request, current_user, "generate-documents"):
+        result = await _generate_documents(request)
+
+    # new weather data -> pre-generate the popular reports, but only after
+    # the response is sent and this request gave its admission slot back
+    # (the pre-warmer only redoes reports for the places that just got new data)
+    if result["status"] == "success":
+        payload = await request.json()  # starlette keeps the parsed body, no second read
+        trigger_spec = {
+            "cities": payload.get("cities", []),
+            "zipcodes": payload.get("zipcodes", []),
+            "person": payload.get("person", ""),
+            "hobbies": payload.get("hobbies", []),
+            "language": payload.get("language", "de"),
+        }
+        background_tasks.add_task(prewarm_service.on_weather_refreshed, trigger_spec)
+    return result
+
+async def _generate_documents(request: Request):
     try:
         # get the data from frontend
         payload = await request.json()
@@ -79,9 +124,13 @@ async def generate_documents(request: Request):
 
         print("Starting to generate weather data...")  # let me know its working
         # call the function that does all the work
-        weather_api.get_all_weather_data(cities, zipcodes, person, hobbies, language)
+        # (in a thread so the server can still answer other requests meanwhile)
+        await run_in_threadpool(weather_api.get_all_weather_data, cities, zipcodes, person, hobbies, language)
         print("Done! Weather data generated successfully!")  # success!
 
+        # new weather data -> load + compress the /weather answers now, not in a reader's request
+        await run_in_threadpool(weather_data_service.invalidate)
+
         # send success response back to frontend
         return {"status": "success", "message": "Weather data created!"}
 
@@ -109,11 +158,21 @@ async def get_scheduler_status():
 
 # endpoint to manually trigger report (for testing)
 @app.post("/scheduler/trigger")
-async def trigger_manual_report():
+async def trigger_manual_report(request: Request, background_tasks: BackgroundTasks, current_user=Depends(auth.get_optional_user)):
     print("Manual report trigger requested!")  # debug
+    async with admitted(request, current_user, "scheduler-trigger"):
+        result = await _trigger_manual_report()
+
+    # we don't know which places the scheduler refreshed, so every popular report may be old
+    if result["status"] == "success":
+        background_tasks.add_task(prewarm_service.on_weather_refreshed)
+    return result
+
+async def _trigger_manual_report():
     try:
-        scheduler.trigger_manual_report()
+        await run_in_threadpool(scheduler.trigger_manual_report)
         print("Report triggered successfully!")  # it works!
+        await run_in_threadpool(weather_data_service.invalidate)
         return {"status": "success", "message": "Report generation started!"}
     except Exception as e:
         print(f"Error triggering report: {e}")  # show error
@@ -121,6 +180,29 @@ async def trigger_manual_report():
         traceback.print_exc()
         return {"status": "error", "message": str(e)}
 
+# endpoint to see how full the admission queue is (per user / IP)
+# only for logged in users, and other users/IPs are shown as hashes
+@app.get("/admission/status")
+async def get_admission_status(request: Request, current_user=Depends(auth.get_current_user)):
+    client_host = request.client.host if request.client else None
+    own_tenant, _ = admission.tenant_for(current_user, client_host)
+    return {"status": "success", "data": admission.controller.snapshot(reveal=own_tenant)}
+
+# endpoint to see how many requests were served by pre-warmed reports
+@app.get("/prewarm/status")
+async def get_prewarm_status():
+    return {"status": "success", "data": prewarm_service.get_report()}
+
+# endpoint to see how fast the AI model writes (tokens/sec, speculative acceptance rate)
+@app.get("/llm/stats")
+async def get_llm_stats():
+    try:
+        from backend.services import llm_service
+        return {"status": "success", "data": llm_service.get_decode_stats()}
+    except Exception as e:
+        print(f"Error getting llm stats: {e}")
+        return {"status": "error", "message": str(e)}
+
 # endpoint to clear cache (if reports get stuck)
 @app.post("/cache/clear")
 async def clear_report_cache():
@@ -130,6 +212,7 @@ async def clear_report_cache():
         from backend.services import llm_service
         cache_size = len(llm_service._report_cache)
         llm_service._report_cache.clear()  # clear it!
+        prewarm_service.forget_prewarmed()
         print(f"Cleared {cache_size} cached reports")  # let me know
         return {"status": "success", "message": f"Cleared {cache_size} cached reports"}
     except Exception as e:
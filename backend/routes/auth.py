@@ -21,6 +21,7 @@ auth_models.Base.metadata.create_all(bind=engine)
 # Setup the router - this is like a mini app inside our main app
 router = APIRouter(prefix="/auth", tags=["auth"])
 security = HTTPBearer()  # this checks for Bearer tokens in headers
+optional_security = HTTPBearer(auto_error=False)  # same but doesn't fail without a token
 
 # Password hashing setup
 # NOTE: using argon2 because it's more secure than bcrypt
@@ -102,6 +103,15 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         raise HTTPException(status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
 
+def get_optional_user(credentials: HTTPAuthorizationCredentials = Depends(optional_security), db: Session = Depends(get_db)):
+    """Like get_current_user, but returns None for anonymous or invalid tokens."""
+    if credentials is None:
+        return None
+    try:
+        return get_current_user(credentials, db)
+    except HTTPException:
+        return None
+
 @router.get("/me", response_model=schemas_auth.UserOut)
 def get_me(current_user: auth_models.User = Depends(get_current_user)):
     return current_user
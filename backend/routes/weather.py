@@ -0,0 +1,107 @@
+# Weather Data Routes - the frontend gets its weather data from here
+# Instead of downloading whole JSON files, the frontend can ask for exactly
+# what it shows, for many locations at once:
+#   GET /weather?plz=10115&plz=20095&fields=current
+#   GET /weather?plz=10115&fields=daily&from_date=2026-01-05&to_date=2026-01-07
+#   GET /weather/postal-codes?plz=10115
+#   GET /weather/postal-codes?city_prefix=Berl
+# Answers have an ETag, so the browser can ask "did it change?" and gets a
+# tiny 304 if not. gzip/brotli versions are made once per data refresh.
+
+import re
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+
+from backend.core import config
+from backend.services import weather_data_service as weather_data
+
+router = APIRouter(prefix="/weather", tags=["weather"])
+
+PLZ_PATTERN = re.compile(r"^\d{5}$")  # german zip codes are 5 digits
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _parse_fields(fields: Optional[str]) -> tuple:
+    # "current,daily" -> ("current", "daily_weekone", "daily_weektwo")
+    # always in the same order so the same query hits the same cache entry
+    if not fields:
+        return weather_data.SECTIONS
+    wanted = set()
+    for field in fields.split(","):
+        field = field.strip()
+        if field == "daily":
+            wanted.update(weather_data.DAILY_SECTIONS)
+        elif field in weather_data.SECTIONS:
+            wanted.add(field)
+        elif field:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {field}")
+    return tuple(s for s in weather_data.SECTIONS if s in wanted)
+
+
+def _check_date(value: Optional[str], name: str):
+    if value is not None and not DATE_PATTERN.match(value):
+        raise HTTPException(status_code=400, detail=f"{name} must look like YYYY-MM-DD")
+
+
+def _send(request: Request, body: weather_data.Body) -> Response:
+    # pick the encoding, then answer 304 if the client already has this version
+    encoding = weather_data.pick_encoding(request.headers.get("accept-encoding"), body)
+    headers = {
+        "ETag": body.etag_for(encoding),
+        "Cache-Control": "no-cache",  # always revalidate, the etag makes that cheap
+        "Vary": "Accept-Encoding",
+    }
+
+    # If-None-Match can have several etags, or "*"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or tags & body.all_etags():
+            return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body.content(encoding), media_type="application/json", headers=headers)
+
+
+@router.get("")
+def get_weather(
+    request: Request,
+    plz: List[str] = Query(...),
+    fields: Optional[str] = None,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+):
+    """Weather for one or many zip codes, only the selected fields and days."""
+    if len(plz) > config.WEATHER_API_MAX_LOCATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {config.WEATHER_API_MAX_LOCATIONS} locations per request")
+    for code in plz:
+        # only real looking zip codes, no random strings
+        if not PLZ_PATTERN.match(code):
+            raise HTTPException(status_code=400, detail=f"Invalid plz: {code}")
+    _check_date(from_date, "from_date")
+    _check_date(to_date, "to_date")
+
+    body, found_any = weather_data.get_weather(plz, _parse_fields(fields), from_date, to_date)
+    if not found_any:
+        raise HTTPException(status_code=404, detail="No weather data for these locations")
+    return _send(request, body)
+
+
+@router.get("/postal-codes")
+def get_postal_codes(
+    request: Request,
+    plz: Optional[str] = None,
+    city: Optional[str] = None,
+    city_prefix: Optional[str] = None,
+):
+    """All postal codes, or only the ones matching plz, city (exact) and/or city_prefix."""
+    if plz is not None and not PLZ_PATTERN.match(plz):
+        raise HTTPException(status_code=400, detail=f"Invalid plz: {plz}")
+    try:
+        body = weather_data.get_postal_codes(plz, city, city_prefix)
+    except weather_data.PostalCodesUnavailable:
+        raise HTTPException(status_code=503, detail="Postal code list is not available right now")
+    return _send(request, body)
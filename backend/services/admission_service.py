@@ -0,0 +1,298 @@
+# Admission Control - who gets to use the AI model next?
+# The model can only write one report at a time, so if one script spams
+# /generate-documents everybody else has to wait forever.
+# This file puts all the expensive jobs into a queue per user (or per IP)
+# and takes turns between users (weighted fair queuing).
+# Learning: asyncio futures, fair scheduling, backpressure!
+
+import asyncio
+import hashlib
+import hmac
+import math
+import secrets
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from backend.core import config
+
+
+class QueueFullError(Exception):
+    # raised when we don't even want to put the job in the queue
+    # retry_after = how many seconds the client should wait before trying again
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Job:
+    # one waiting (or running) request
+    def __init__(self, tenant: str, kind: str, cost: float, finish_tag: float):
+        self.tenant = tenant
+        self.kind = kind  # like "generate-documents" - used for time estimates
+        self.cost = cost
+        self.finish_tag = finish_tag  # smaller tag = served first
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class _Tenant:
+    # everything we know about one user / IP that currently has work
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.queue = deque()
+        self.in_flight = 0
+        self.last_finish = 0.0  # finish tag of the last job this tenant queued
+
+
+class AdmissionController:
+    """Weighted fair queue in front of the expensive endpoints.
+
+    Every tenant gets its own FIFO. Jobs get a virtual finish tag
+    (start + cost / weight) and the free worker slot always goes to the
+    smallest tag, so a tenant with 50 queued jobs can't starve a tenant with 1.
+    """
+
+    def __init__(self, max_concurrent=None, max_in_flight_per_tenant=None,
+                 max_queued_per_tenant=None, max_wait_seconds=None,
+                 default_job_seconds=None):
+        # settings come from config.py unless a value is passed in
+        # (checking "is None" so an explicit 0 is not replaced by the default)
+        def setting(value, default):
+            return default if value is None else value
+
+        self.max_concurrent = setting(max_concurrent, config.ADMISSION_MAX_CONCURRENT)
+        self.max_in_flight_per_tenant = setting(max_in_flight_per_tenant, config.ADMISSION_MAX_IN_FLIGHT_PER_USER)
+        self.max_queued_per_tenant = setting(max_queued_per_tenant, config.ADMISSION_MAX_QUEUED_PER_USER)
+        self.max_wait_seconds = setting(max_wait_seconds, config.ADMISSION_MAX_WAIT_SECONDS)
+        self.default_job_seconds = setting(default_job_seconds, config.ADMISSION_DEFAULT_JOB_SECONDS)
+
+        self._tenants = {}  # tenant key -> _Tenant
+        # admitted/rejected counters live here and not in _Tenant, because idle
+        # tenants are forgotten right away (oldest counters are dropped first)
+        self._counters = OrderedDict()
+        self._running = set()  # jobs that currently hold a worker slot
+        self._virtual_time = 0.0
+        self._job_seconds = {}  # kind -> moving average of how long a job takes
+        self.total_admitted = 0
+        self.total_rejected = 0
+
+    # ---------- time estimates ----------
+
+    def expected_seconds(self, kind: str) -> float:
+        # moving average of past jobs, or the default if we never ran one
+        return self._job_seconds.get(kind, self.default_job_seconds)
+
+    def _record_duration(self, kind: str, seconds: float):
+        # exponential moving average (EWMA) - new jobs count 20%
+        old = self._job_seconds.get(kind)
+        if old is None:
+            self._job_seconds[kind] = seconds
+        else:
+            self._job_seconds[kind] = 0.8 * old + 0.2 * seconds
+
+    def estimate_wait(self, finish_tag: float = None) -> float:
+        """Rough number of seconds until a job with this finish tag would start.
+
+        Only queued jobs with a smaller or equal tag are in front of it, so a
+        tenant with a full queue doesn't make everybody else wait. Without a
+        tag all queued work is counted (used for the status page).
+        """
+        now = time.monotonic()
+        work = 0.0
+
+        # what is still left of the running jobs
+        for job in self._running:
+            elapsed = now - job.started_at
+            work += max(0.0, self.expected_seconds(job.kind) * job.cost - elapsed)
+
+        # plus everything that is waiting in front of us
+        for tenant in self._tenants.values():
+            for job in tenant.queue:
+                if finish_tag is None or job.finish_tag <= finish_tag:
+                    work += self.expected_seconds(job.kind) * job.cost
+
+        # the slots work in parallel
+        return work / max(1, self.max_concurrent)
+
+    # ---------- queue handling ----------
+
+    def _get_tenant(self, tenant_key: str, weight: float) -> _Tenant:
+        tenant = self._tenants.get(tenant_key)
+        if tenant is None:
+            tenant = _Tenant(weight)
+            self._tenants[tenant_key] = tenant
+        tenant.weight = weight  # weight can change (e.g. user logged in)
+        return tenant
+
+    def _forget_if_idle(self, tenant_key: str):
+        # drop tenants with nothing queued or running so the dict doesn't grow forever
+        tenant = self._tenants.get(tenant_key)
+        if tenant is not None and not tenant.queue and tenant.in_flight == 0:
+            del self._tenants[tenant_key]
+
+    def _count(self, tenant_key: str, what: str):
+        counters = self._counters.get(tenant_key)
+        if counters is None:
+            counters = {"admitted": 0, "rejected": 0}
+            self._counters[tenant_key] = counters
+        self._counters.move_to_end(tenant_key)
+        counters[what] += 1
+        while len(self._counters) > config.ADMISSION_MAX_TRACKED_TENANTS:
+            self._counters.popitem(last=False)
+
+    def _reject(self, tenant_key: str, message: str, retry_after: float):
+        self._count(tenant_key, "rejected")
+        self.total_rejected += 1
+        self._forget_if_idle(tenant_key)
+        raise QueueFullError(message, max(1, math.ceil(retry_after)))
+
+    def _dispatch(self):
+        # give free slots to the waiting job with the smallest finish tag
+        # (only tenants that are still below their in-flight cap can win)
+        while len(self._running) < self.max_concurrent:
+            best = None
+            for tenant in self._tenants.values():
+                if not tenant.queue or tenant.in_flight >= self.max_in_flight_per_tenant:
+                    continue
+                head = tenant.queue[0]
+                if best is None or head.finish_tag < best.finish_tag:
+                    best = head
+            if best is None:
+                return  # nothing we are allowed to start
+
+            tenant = self._tenants[best.tenant]
+            tenant.queue.popleft()
+            if best.future.cancelled():
+                continue  # the waiter is being cancelled right now, skip it
+            tenant.in_flight += 1
+            best.started_at = time.monotonic()
+            self._running.add(best)
+            # virtual clock moves forward to the job we just started
+            self._virtual_time = max(self._virtual_time, best.finish_tag - best.cost / tenant.weight)
+            best.future.set_result(True)
+
+    def _release(self, job: _Job):
+        if job in self._running:
+            self._running.discard(job)
+            self._record_duration(job.kind, time.monotonic() - job.started_at)
+            tenant = self._tenants.get(job.tenant)
+            if tenant is not None:
+                tenant.in_flight -= 1
+        self._forget_if_idle(job.tenant)
+        self._dispatch()
+
+    def _cancel_waiting(self, job: _Job):
+        # client went away while still waiting in the queue
+        tenant = self._tenants.get(job.tenant)
+        if tenant is not None and job in tenant.queue:
+            tenant.queue.remove(job)
+        self._forget_if_idle(job.tenant)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, tenant_key: str, kind: str, weight: float = 1.0, cost: float = 1.0):
+        """Wait for a worker slot, or raise QueueFullError right away.
+
+        Usage:
+            async with controller.admit("user:1", "generate-documents"):
+                ... do the expensive work ...
+        """
+        tenant = self._get_tenant(tenant_key, weight)
+
+        # where this job would sit in the fair queue
+        start_tag = max(self._virtual_time, tenant.last_finish)
+        finish_tag = start_tag + cost / tenant.weight
+
+        # backpressure check 1: this tenant already has too much waiting
+        if len(tenant.queue) >= self.max_queued_per_tenant:
+            wait = self.estimate_wait(finish_tag)
+            self._reject(tenant_key, "Too many queued requests for this user", wait)
+
+        # backpressure check 2: the jobs in front of this one take too long,
+        # fail fast instead of letting the request time out after minutes
+        wait = self.estimate_wait(finish_tag)
+        if wait > self.max_wait_seconds:
+            self._reject(tenant_key, f"Server busy, estimated wait {wait:.0f}s", wait)
+
+        job = _Job(tenant_key, kind, cost, finish_tag)
+        tenant.last_finish = job.finish_tag
+        tenant.queue.append(job)
+        self._count(tenant_key, "admitted")
+        self.total_admitted += 1
+        self._dispatch()
+
+        try:
+            await job.future
+        except asyncio.CancelledError:
+            if job in self._running:
+                self._release(job)  # we got the slot just as we were cancelled
+            else:
+                self._cancel_waiting(job)
+            raise
+
+        try:
+            yield job
+        finally:
+            self._release(job)
+
+    def is_idle(self) -> bool:
+        # nothing running and nothing waiting (used by the pre-warmer)
+        return not self._running and not any(t.queue for t in list(self._tenants.values()))
+
+    # ---------- metrics ----------
+
+    def snapshot(self, reveal: str = None) -> dict:
+        """Per-tenant queue occupancy for the /admission/status endpoint.
+
+        Tenant keys contain user ids and IP addresses, so every key except
+        `reveal` (the caller's own) is replaced by a short hash.
+        """
+        now = time.monotonic()
+        tenants = {}
+        for key in list(self._counters) + [k for k in self._tenants if k not in self._counters]:
+            tenant = self._tenants.get(key)
+            counters = self._counters.get(key, {"admitted": 0, "rejected": 0})
+            oldest = tenant.queue[0].enqueued_at if tenant is not None and tenant.queue else None
+            tenants[key if key == reveal else _hide(key)] = {
+                "queued": len(tenant.queue) if tenant is not None else 0,
+                "in_flight": tenant.in_flight if tenant is not None else 0,
+                "weight": tenant.weight if tenant is not None else None,
+                "admitted": counters["admitted"],
+                "rejected": counters["rejected"],
+                "oldest_wait_seconds": round(now - oldest, 2) if oldest is not None else 0.0,
+            }
+        return {
+            "running": len(self._running),
+            "max_concurrent": self.max_concurrent,
+            "queued": sum(len(t.queue) for t in self._tenants.values()),
+            "estimated_wait_seconds": round(self.estimate_wait(), 2),
+            "max_wait_seconds": self.max_wait_seconds,
+            "job_seconds": {kind: round(s, 2) for kind, s in self._job_seconds.items()},
+            "total_admitted": self.total_admitted,
+            "total_rejected": self.total_rejected,
+            "tenants": tenants,
+        }
+
+
+# random key, new every time the server starts - without it anybody could
+# just hash "user:1", "user:2", ... or every IPv4 address and compare
+_HIDE_KEY = secrets.token_bytes(32)
+
+
+def _hide(tenant_key: str) -> str:
+    # same tenant -> same label (until a restart), but you can't get the id or IP back
+    return "tenant-" + hmac.new(_HIDE_KEY, tenant_key.encode(), hashlib.sha256).hexdigest()[:10]
+
+
+# one controller for the whole app (all expensive endpoints share the model)
+controller = AdmissionController()
+
+
+def tenant_for(user, client_host: str):
+    # logged in users are identified by their id, everyone else by IP
+    # returns (tenant key, weight)
+    if user is not None:
+        return f"user:{user.id}", config.ADMISSION_USER_WEIGHT
+    return f"ip:{client_host or 'unknown'}", config.ADMISSION_ANON_WEIGHT
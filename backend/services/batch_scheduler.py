@@ -0,0 +1,89 @@
+# Batch Scheduler - collects prompts from many threads into one model call
+# Used by hf_model.py for flan-t5: one generate call with 8 prompts is much
+# faster than 8 calls with one prompt each.
+# (no transformers import here, the model comes in through generator_factory)
+
+import queue
+import threading
+import time
+
+
+class _PendingPrompt:
+    def __init__(self, text: str):
+        self.text = text
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchScheduler:
+    """
+    Collects prompts from concurrent callers and runs them as one batched
+    generate call. A batch is sent when it is full or when the oldest prompt
+    has waited max_wait_ms.
+
+    Batches can only fill up if several prompts are running at the same time,
+    so the admission queue in front of the endpoints needs more than one slot
+    (set config.ADMISSION_MAX_CONCURRENT to HF_BATCH_MAX_SIZE when the reports
+    come from flan-t5). With max_batch_size=1 prompts are sent without waiting.
+    """
+
+    def __init__(self, generator_factory, max_batch_size: int, max_wait_ms: float):
+        self.generator_factory = generator_factory
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches_run = 0
+        self.prompts_run = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, text: str) -> str:
+        """Blocks until the batch containing this prompt is generated."""
+        self._ensure_worker()
+        pending = _PendingPrompt(text)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="flan-t5-batcher", daemon=True)
+                    self._worker.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                generator = self.generator_factory()
+                # the pipeline pads the inputs to the longest prompt in the batch
+                outputs = generator([p.text for p in batch], batch_size=len(batch))
+                for pending, output in zip(batch, outputs):
+                    if isinstance(output, list):
+                        output = output[0]
+                    pending.result = output["generated_text"]
+                self.batches_run += 1
+                self.prompts_run += len(batch)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
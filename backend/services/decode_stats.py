@@ -0,0 +1,84 @@
+# Decode Statistics - how fast does the AI model write?
+# Reading the prompt ("prefill") and writing the answer ("decode") are timed
+# separately. Our multi-city prompts are long, so on the CPU the prefill is a
+# big part of every call - counted together it would hide how much faster
+# speculative decoding writes the answer.
+# (no llama_cpp import here so the bookkeeping can be tested without a model)
+
+import threading
+import time
+
+
+class TokenClock:
+    # given to the model as stopping_criteria: llama_cpp calls it once for
+    # every token it generates, so the first call = end of the prefill.
+    # It never stops the generation, it only looks at the clock.
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.tokens = 0
+
+    def __call__(self, input_ids, logits) -> bool:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += 1
+        return False
+
+
+class DecodeStats:
+    """Counters behind /llm/stats and the speculative decoding benchmark."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # start counting from zero again (used by the benchmark between runs)
+        with self._lock:
+            self._counts = {
+                "calls": 0,
+                "completion_tokens": 0,
+                "prefill_seconds": 0.0,  # reading the prompt, up to the first token
+                "decode_tokens": 0,  # tokens after the first one
+                "decode_seconds": 0.0,  # time for those tokens only
+                "draft_calls": 0,  # how often the draft was asked for tokens (= model steps)
+                "proposed_tokens": 0,  # tokens the draft suggested
+                "accepted_tokens": 0,  # suggested tokens the model agreed with
+            }
+
+    def count_draft(self, proposed: int):
+        # called by the draft model once per model step
+        with self._lock:
+            self._counts["draft_calls"] += 1
+            self._counts["proposed_tokens"] += proposed
+
+    def measure(self, model, prompt: str, **kwargs) -> dict:
+        """Runs model(prompt, **kwargs) and adds its timings to the counters."""
+        with self._lock:
+            draft_calls_before = self._counts["draft_calls"]
+        clock = TokenClock()
+        output = model(prompt, stopping_criteria=clock, **kwargs)
+        end = time.perf_counter()
+
+        tokens = output["usage"]["completion_tokens"]
+        first_token_at = clock.first_token_at if clock.first_token_at is not None else end
+        with self._lock:
+            counts = self._counts
+            # every model step gives one token of its own + the draft tokens it accepted
+            steps = counts["draft_calls"] - draft_calls_before
+            counts["calls"] += 1
+            counts["completion_tokens"] += tokens
+            counts["prefill_seconds"] += first_token_at - clock.started
+            counts["decode_tokens"] += max(0, tokens - 1)  # the first token comes out of the prefill
+            counts["decode_seconds"] += end - first_token_at
+            if steps:
+                counts["accepted_tokens"] += max(0, tokens - steps)
+        return output
+
+    def snapshot(self) -> dict:
+        # counters + acceptance rate and decode-only tokens/sec
+        with self._lock:
+            stats = dict(self._counts)
+        stats["acceptance_rate"] = round(stats["accepted_tokens"] / stats["proposed_tokens"], 3) if stats["proposed_tokens"] else 0.0
+        stats["decode_tokens_per_sec"] = round(stats["decode_tokens"] / stats["decode_seconds"], 2) if stats["decode_seconds"] else 0.0
+        return stats
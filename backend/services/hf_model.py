@@ -1,9 +1,12 @@
 from transformers import pipeline
+from backend.core import config
+from backend.services.batch_scheduler import BatchScheduler
 from . import IO
 import threading
 
 _lock = threading.Lock()
 _generator = None
+_batcher = None
 MAX_INPUT_LENGTH = 450  # conservative token limit to avoid exceeding model context
 
 
@@ -20,6 +23,19 @@ def get_generator():
     return _generator
 
 
+def get_batcher() -> BatchScheduler:
+    global _batcher
+    if _batcher is None:
+        with _lock:
+            if _batcher is None:
+                _batcher = BatchScheduler(
+                    get_generator,
+                    max_batch_size=config.HF_BATCH_MAX_SIZE,
+                    max_wait_ms=config.HF_BATCH_MAX_WAIT_MS,
+                )
+    return _batcher
+
+
 def compact_weather_summary(data: dict) -> str:
     """
     Reduce structured weather JSON to a compact textual summary
@@ -76,9 +92,6 @@ def prompt(cities: list, person: str, hobbies: list, language: str, zipcodes: li
         "Start immediately with the report.\n"
     )
 
-    generator = get_generator()
-    result = generator(prompt_str)
-
-    text = result[0]["generated_text"]
+    text = get_batcher().submit(prompt_str)
     IO.write_prompt_to_txt(text, person)
     return text
@@ -3,28 +3,73 @@
 # Student project - learning to use AI models!
 
 from backend.utils import io_handler as IO
+from backend.services import prewarm_service
+from backend.services.decode_stats import DecodeStats
+from backend.core import config
 from llama_cpp import Llama  # this is the library for running Llama models
+from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
 import os
+import threading
 import hashlib  # for making unique keys
 import json  # for working with JSON data
 
-# Load the AI model - this takes a while first time!
-# The model is downloaded from HuggingFace automatically
-print("Loading AI model... (this might take a minute)")
-llm = Llama.from_pretrained(
-    repo_id="hugging-quants/Llama-3.2-3B-Instruct-Q4_K_M-GGUF",  # model name
-    filename="llama-3.2-3b-instruct-q4_k_m.gguf",  # model file
-    n_ctx=4096,  # context window size
-    n_gpu_layers=32,  # use GPU if available
-    n_threads=os.cpu_count(),  # use all CPU cores
-    verbose=False  # dont show too much info
-)
-print("Model loaded successfully!")
+# Numbers about decoding speed (shown at /llm/stats)
+_decode_stats = DecodeStats()
+
+
+class CountingPromptLookup(LlamaPromptLookupDecoding):
+    # Speculative decoding without a second model: the "draft" is just
+    # copied from the prompt (city names, temperatures, dates, hobbies...)
+    # and the real model checks all drafted tokens in one step.
+    # This subclass only counts how many tokens it suggested.
+    def __call__(self, input_ids, *args, **kwargs):
+        draft = super().__call__(input_ids, *args, **kwargs)
+        _decode_stats.count_draft(len(draft))
+        return draft
+
+
+def load_model(speculative: bool, num_pred_tokens: int = config.LLM_SPECULATIVE_NUM_PRED_TOKENS,
+               n_gpu_layers: int = 32) -> Llama:
+    # NOTE: the draft model has to be there when the model is created,
+    # llama_cpp sets up the context differently for speculative decoding
+    # n_gpu_layers=0 runs everything on the CPU (used by the benchmark)
+    return Llama.from_pretrained(
+        repo_id="hugging-quants/Llama-3.2-3B-Instruct-Q4_K_M-GGUF",  # model name
+        filename="llama-3.2-3b-instruct-q4_k_m.gguf",  # model file
+        n_ctx=4096,  # context window size
+        n_gpu_layers=n_gpu_layers,  # use GPU if available
+        n_threads=os.cpu_count(),  # use all CPU cores
+        # optional: speculative decoding with tokens looked up in the prompt
+        draft_model=CountingPromptLookup(num_pred_tokens=num_pred_tokens) if speculative else None,
+        verbose=False  # dont show too much info
+    )
+
+
+# The AI model is loaded the first time we need it (not on import), so
+# the benchmark can import this file without loading a third model
+_llm = None
+_load_lock = threading.Lock()
+
+def get_llm() -> Llama:
+    # Load the AI model - this takes a while first time!
+    # The model is downloaded from HuggingFace automatically
+    global _llm
+    if _llm is None:
+        with _load_lock:
+            if _llm is None:
+                print("Loading AI model... (this might take a minute)")
+                _llm = load_model(config.LLM_SPECULATIVE)
+                print(f"Model loaded successfully! (speculative decoding: {config.LLM_SPECULATIVE})")
+    return _llm
 
 # Cache to save reports - so we don't generate same thing twice!
 # this is a dictionary that stores reports we already made
 _report_cache = {}
 
+# the model can only do one thing at a time, so requests and the
+# pre-warmer (which runs in a background thread) take turns
+_llm_lock = threading.Lock()
+
 def _generate_cache_key(cities: list, person: str, hobbies: list, language: str, zipcodes: list) -> str:
     # this function makes a unique key for each combination of inputs
     # so we can check if we already generated this report before
@@ -41,28 +86,8 @@ def _generate_cache_key(cities: list, person: str, hobbies: list, language: str,
     cache_string = json.dumps(cache_data, sort_keys=True)
     return hashlib.md5(cache_string.encode()).hexdigest()
 
-def prompt(cities: list, person: str, hobbies: list, language: str, zipcodes: list):
-    # Main function that generates weather reports
-    # Takes in cities, person style, hobbies, language and zipcodes
-    # Returns a text report
-    
-    print(f"\\n--- Starting report generation for {person} ---")
-    
-    # First check if we already made this report before (cache check)
-    cache_key = _generate_cache_key(cities, person, hobbies, language, zipcodes)
-    
-    if cache_key in _report_cache:
-        print(f"Found it in cache! Using saved report for {person}")
-        return _report_cache[cache_key]
-    
-    print(f"Not in cache - generating NEW report for {person}")
-    
-    # Get weather data from JSON files
-    print("Getting weather data from files...")
-    data = IO.get_dict_from_json(zipcodes, cities)
-    print(f"Got data for {len(data)} locations")
-
-    # Now we need to create the prompt for the AI
+def build_prompt(data: dict, person: str, hobbies: list, language: str) -> str:
+    # Builds the full Llama 3 prompt from the weather data
     # We tell the AI what to do step by step
     
     # Step 1: Create system instructions (rules for the AI)
@@ -97,18 +122,24 @@ def prompt(cities: list, person: str, hobbies: list, language: str, zipcodes: li
     formatted_prompt += f"<|start_header_id|>user<|end_header_id|>\n\n{user_content}<|eot_id|>"
     formatted_prompt += f"<|start_header_id|>assistant<|end_header_id|>\n\n"
     
-    print("Sending to AI model... (this takes a few seconds)")
-    
+    return formatted_prompt
+
+def generate_text(formatted_prompt: str, temperature: float = 0.3, model: Llama = None) -> str:
     # Step 4: Call the AI model
-    output = llm(
-        formatted_prompt,
-        max_tokens=500,  # maximum length of response
-        temperature=0.3,  # lower = more factual, higher = more creative
-        top_p=0.9,  # another parameter for randomness
-        stop=["<|eot_id|>", "<|end_of_text|>"]  # when to stop generating
-    )
-    
-    print("AI finished generating!")
+    # (temperature=0 means greedy decoding, model= is only used by the benchmark)
+    model = model or get_llm()
+    with _llm_lock:
+        # measure() times the prompt reading and the writing separately
+        output = _decode_stats.measure(
+            model,
+            formatted_prompt,
+            max_tokens=500,  # maximum length of response
+            temperature=temperature,  # lower = more factual, higher = more creative
+            top_p=0.9,  # another parameter for randomness
+            stop=["<|eot_id|>", "<|end_of_text|>"]  # when to stop generating
+        )
+    
+    print(f"AI finished generating! {output['usage']['completion_tokens']} tokens")
     
     # Step 5: Extract the text from AI output
     text = output["choices"][0]["text"].strip()
@@ -117,11 +148,65 @@ def prompt(cities: list, person: str, hobbies: list, language: str, zipcodes: li
     if "<|assistant|>" in text:
         text = text.split("<|assistant|>")[-1].strip()
     
+    return text
+
+def reset_decode_stats():
+    # start counting from zero again (used by the benchmark between runs)
+    with _llm_lock:
+        _decode_stats.reset()
+
+def get_decode_stats() -> dict:
+    # acceptance rate + decode-only tokens/sec for the /llm/stats endpoint
+    stats = _decode_stats.snapshot()
+    stats["speculative"] = config.LLM_SPECULATIVE
+    return stats
+
+def prompt(cities: list, person: str, hobbies: list, language: str, zipcodes: list, prewarm: bool = False):
+    # Main function that generates weather reports
+    # Takes in cities, person style, hobbies, language and zipcodes
+    # Returns a text report
+    # prewarm=True is used by prewarm_service: always regenerate, only fill the cache
+    
+    print(f"\\n--- Starting report generation for {person} ---")
+    
+    # First check if we already made this report before (cache check)
+    cache_key = _generate_cache_key(cities, person, hobbies, language, zipcodes)
+    
+    if not prewarm:
+        # remember the request so the pre-warmer knows what is popular
+        spec = {"cities": cities, "zipcodes": zipcodes, "person": person, "hobbies": hobbies, "language": language}
+        prewarm_service.record_request(cache_key, spec, cache_key in _report_cache)
+
+        if cache_key in _report_cache:
+            print(f"Found it in cache! Using saved report for {person}")
+            text = _report_cache[cache_key]
+            if prewarm_service.needs_file_write(cache_key):
+                # pre-warmed reports were never written to the file yet
+                IO.write_prompt_to_txt(text, person)
+                prewarm_service.file_written(cache_key)
+            return text
+    
+    print(f"Not in cache - generating NEW report for {person}")
+    
+    # Get weather data from JSON files
+    print("Getting weather data from files...")
+    data = IO.get_dict_from_json(zipcodes, cities)
+    print(f"Got data for {len(data)} locations")
+
+    # Steps 1-3: build the prompt, Steps 4-5: let the model write the report
+    formatted_prompt = build_prompt(data, person, hobbies, language)
+    
+    print("Sending to AI model... (this takes a few seconds)")
+    text = generate_text(formatted_prompt)
+    
     print(f"Generated text length: {len(text)} characters")
     
     # Step 6: Save the report to a file
-    print("Saving report to file...")
-    IO.write_prompt_to_txt(text, person)
+    # (not when pre-warming - that would overwrite the report the user is looking at)
+    if not prewarm:
+        print("Saving report to file...")
+        IO.write_prompt_to_txt(text, person)
+        prewarm_service.forget_prewarmed(cache_key)
     
     # Step 7: Store in cache so we don't have to generate again
     _report_cache[cache_key] = text
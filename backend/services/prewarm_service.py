@@ -0,0 +1,321 @@
+# Report Pre-Warming
+# Most people ask for the same stuff: Berlin/Hamburg/Munich, Merkel/Haftbefehl/Fisch,
+# german or english, and mostly in the morning.
+# So we remember what people asked for (request history) and after a weather
+# refresh we generate the most popular reports in the background while the
+# server has nothing to do. Then the real request is just a cache hit!
+# Learning: threads, time decay, json files as a tiny database
+
+import asyncio
+import json
+import math
+import threading
+import time
+from datetime import datetime
+
+from backend.core import config
+
+_lock = threading.Lock()  # protects the history + stats below
+_running = False  # only one pre-warm run at a time (runs on the event loop)
+PREWARM_TENANT = "prewarm"  # admission queue tenant for pre-warm jobs
+
+# cache_key -> {"spec": {...}, "score": float, "updated": timestamp, "count": int}
+_history = {}
+_history_loaded = False
+_history_dirty = False
+_last_save = 0.0
+
+# cache keys whose report was made by the pre-warmer (not by a user request)
+# - stays until a normal request regenerates it or the cache is cleared
+_prewarmed_keys = set()
+# pre-warmed reports that were not written to the persona text file yet
+_unwritten_keys = set()
+
+_stats = {
+    "requests": 0,
+    "cache_hits": 0,
+    "prewarmed_hits": 0,
+    "peak_requests": 0,
+    "peak_prewarmed_hits": 0,
+}
+_last_run = {}
+_last_run_started = 0.0
+
+
+# ---------- request history ----------
+
+def _decayed(score: float, updated: float, now: float) -> float:
+    # old requests count less and less (half life from config)
+    half_life = config.PREWARM_HALF_LIFE_HOURS * 3600
+    return score * math.pow(0.5, (now - updated) / half_life)
+
+
+def _load_history():
+    # read the history file once (the first time we need it)
+    global _history_loaded
+    if _history_loaded:
+        return
+    _history_loaded = True
+    path = config.PREWARM_HISTORY_FILE
+    if not path.exists():
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            _history.update(json.load(f))
+        print(f"Loaded {len(_history)} report specs from request history")  # debug
+    except Exception as e:
+        print(f"Could not read request history: {e}")  # not a big deal, start empty
+
+
+def save_history(force: bool = False):
+    """Write the history file if it changed (at most every few minutes unless forced).
+
+    Called after every weather refresh and (forced) at shutdown, never per request.
+    """
+    global _history_dirty, _last_save
+    with _lock:
+        if not _history_dirty:
+            return
+        if not force and time.monotonic() - _last_save < config.PREWARM_HISTORY_SAVE_SECONDS:
+            return
+        data = json.dumps(_history)  # copy under the lock, write outside of it
+        _history_dirty = False
+        _last_save = time.monotonic()
+
+    path = config.PREWARM_HISTORY_FILE
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        tmp_path.replace(path)  # replace in one go so the file is never half written
+    except Exception as e:
+        print(f"Could not save request history: {e}")
+
+
+def _is_peak_hour(hour: int) -> bool:
+    start, end = config.PREWARM_PEAK_HOURS
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end  # range over midnight, like 22-2
+
+
+def record_request(cache_key: str, spec: dict, cache_hit: bool):
+    """Remember one report request (called from llm_service.prompt)."""
+    now = time.time()
+    peak = _is_peak_hour(datetime.now().hour)
+
+    global _history_dirty
+    with _lock:
+        _load_history()
+        _history_dirty = True
+
+        # update the decayed popularity score of this spec
+        entry = _history.get(cache_key)
+        if entry is None:
+            entry = {"spec": spec, "score": 0.0, "updated": now, "count": 0}
+            _history[cache_key] = entry
+        entry["score"] = _decayed(entry["score"], entry["updated"], now) + 1.0
+        entry["updated"] = now
+        entry["count"] += 1
+
+        # keep the log small - throw away the least popular specs
+        if len(_history) > config.PREWARM_HISTORY_MAX_SPECS:
+            ranked = sorted(_history, key=lambda k: _decayed(_history[k]["score"], _history[k]["updated"], now))
+            for key in ranked[:len(_history) - config.PREWARM_HISTORY_MAX_SPECS]:
+                del _history[key]
+
+        # hit rate statistics
+        prewarmed = cache_hit and cache_key in _prewarmed_keys
+        _stats["requests"] += 1
+        if cache_hit:
+            _stats["cache_hits"] += 1
+        if prewarmed:
+            _stats["prewarmed_hits"] += 1
+        if peak:
+            _stats["peak_requests"] += 1
+            if prewarmed:
+                _stats["peak_prewarmed_hits"] += 1
+
+
+def top_specs(k: int = None) -> list:
+    """The k most popular report specs right now (most popular first)."""
+    k = k or config.PREWARM_TOP_K
+    now = time.time()
+    with _lock:
+        _load_history()
+        ranked = sorted(
+            _history.items(),
+            key=lambda item: _decayed(item[1]["score"], item[1]["updated"], now),
+            reverse=True,
+        )
+        return [(key, entry["spec"]) for key, entry in ranked[:k]]
+
+
+# ---------- pre-warmed cache entries ----------
+
+def mark_prewarmed(cache_key: str):
+    _prewarmed_keys.add(cache_key)
+    _unwritten_keys.add(cache_key)
+
+
+def needs_file_write(cache_key: str) -> bool:
+    # pre-warmed reports are only cached, the text file still has to be written
+    return cache_key in _unwritten_keys
+
+
+def file_written(cache_key: str):
+    _unwritten_keys.discard(cache_key)
+
+
+def forget_prewarmed(cache_key: str = None):
+    # called when a cache entry is replaced by a normal request or the cache is cleared
+    if cache_key is None:
+        _prewarmed_keys.clear()
+        _unwritten_keys.clear()
+    else:
+        _prewarmed_keys.discard(cache_key)
+        _unwritten_keys.discard(cache_key)
+
+
+# ---------- the pre-warmer ----------
+
+def _spec_places(spec: dict) -> set:
+    # zip codes + city names of a spec (cities lower case, people type them differently)
+    return set(spec.get("zipcodes") or []) | {c.lower() for c in spec.get("cities") or []}
+
+
+def _needs_prewarm(cache_key: str, spec: dict, cached, refreshed, fresh_key: str = None) -> bool:
+    """Only reports that are missing from the cache or were made with old weather.
+
+    refreshed = places that just got new data, None if we don't know (then
+    every cached report might be old). fresh_key = the report the refreshing
+    request just wrote itself.
+    """
+    if cache_key not in cached:
+        return True
+    if cache_key == fresh_key:
+        return False  # made a few seconds ago with the new data
+    if refreshed is None:
+        return True
+    return bool(_spec_places(spec) & refreshed)
+
+
+async def _server_is_idle(controller) -> bool:
+    # idle = no report request is waiting or running and the CPU isn't busy
+    if not controller.is_idle():
+        return False
+    try:
+        import psutil
+    except ImportError:
+        return True  # can't measure CPU, only trust the admission queue
+    cpu = await asyncio.to_thread(psutil.cpu_percent, 1.0)  # don't block the event loop
+    return cpu <= config.PREWARM_MAX_CPU_PERCENT and controller.is_idle()
+
+
+async def run_prewarm(trigger_spec: dict = None):
+    """Regenerate the top-K specs that are missing or old, stopping as soon as the server gets busy.
+
+    trigger_spec = the report request that refreshed the weather data (its
+    zipcodes/cities are the refreshed places), None = all places may be new.
+    Every generation goes through the admission queue as a low-weight tenant,
+    so the wait estimate for real users knows the model is busy.
+    """
+    global _last_run, _running
+    if _running:
+        print("Pre-warm already running, skipping")  # debug
+        return
+    _running = True
+
+    try:
+        # imported here because llm_service needs llama_cpp (big import)
+        from backend.services import admission_service as admission
+        from backend.services import llm_service
+
+        refreshed = None
+        fresh_key = None
+        if trigger_spec is not None:
+            refreshed = _spec_places(trigger_spec)
+            fresh_key = llm_service._generate_cache_key(
+                trigger_spec["cities"], trigger_spec["person"], trigger_spec["hobbies"],
+                trigger_spec["language"], trigger_spec["zipcodes"],
+            )
+
+        # reports that are cached and whose weather didn't change are still good
+        popular = top_specs()
+        specs = [(key, spec) for key, spec in popular
+                 if _needs_prewarm(key, spec, llm_service._report_cache, refreshed, fresh_key)]
+        started = time.time()
+        done = 0
+        skipped_busy = 0
+        print(f"Pre-warming {len(specs)} popular reports ({len(popular) - len(specs)} already up to date)...")
+
+        for cache_key, spec in specs:
+            if not await _server_is_idle(admission.controller):
+                skipped_busy = len(specs) - done
+                print("Server got busy, stopping pre-warm")
+                break
+            try:
+                async with admission.controller.admit(PREWARM_TENANT, "prewarm", weight=config.PREWARM_WEIGHT):
+                    await asyncio.to_thread(
+                        llm_service.prompt,
+                        spec["cities"], spec["person"], spec["hobbies"],
+                        spec["language"], spec["zipcodes"], prewarm=True,
+                    )
+                mark_prewarmed(cache_key)
+                done += 1
+            except admission.QueueFullError:
+                skipped_busy = len(specs) - done
+                print("Admission queue is full, stopping pre-warm")
+                break
+            except Exception as e:
+                print(f"Pre-warm failed for {spec}: {e}")
+
+        _last_run = {
+            "started": datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+            "seconds": round(time.time() - started, 1),
+            "planned": len(specs),
+            "up_to_date": len(popular) - len(specs),
+            "generated": done,
+            "stopped_busy": skipped_busy,
+        }
+        print(f"Pre-warm finished: {done}/{len(specs)} reports ready")
+    finally:
+        _running = False
+
+
+async def on_weather_refreshed(trigger_spec: dict = None):
+    """Pre-warm after new weather data arrived.
+
+    Meant for FastAPI BackgroundTasks, so it only starts after the request
+    that refreshed the data has left the admission queue. trigger_spec is
+    that request's report spec (None for the scheduler, which refreshes everything).
+    """
+    global _last_run_started
+    await asyncio.to_thread(save_history)  # throttled by PREWARM_HISTORY_SAVE_SECONDS
+    if not config.PREWARM_ENABLED:
+        return
+    now = time.time()
+    if now - _last_run_started < config.PREWARM_MIN_INTERVAL_SECONDS:
+        return  # we just did one, the cache is still fresh
+    _last_run_started = now
+    await run_prewarm(trigger_spec)
+
+
+def get_report() -> dict:
+    """Hit rate report for the /prewarm/status endpoint."""
+    with _lock:
+        stats = dict(_stats)
+    peak_requests = stats["peak_requests"]
+    return {
+        "enabled": config.PREWARM_ENABLED,
+        "top_k": config.PREWARM_TOP_K,
+        "max_cpu_percent": config.PREWARM_MAX_CPU_PERCENT,
+        "peak_hours": list(config.PREWARM_PEAK_HOURS),
+        **stats,
+        "hit_rate": round(stats["cache_hits"] / stats["requests"], 3) if stats["requests"] else 0.0,
+        "peak_prewarmed_hit_rate": round(stats["peak_prewarmed_hits"] / peak_requests, 3) if peak_requests else 0.0,
+        "prewarmed_entries": len(_prewarmed_keys),
+        "last_run": _last_run,
+        "top_specs": [spec for _, spec in top_specs()],
+    }
@@ -0,0 +1,288 @@
+# Weather Data Service - serves the structured weather JSON files
+# The frontend used to download the whole {plz}_structured.json (all hours,
+# both weeks) and the huge postal_codes.json even if it only shows one piece.
+# This file loads the data once, cuts out only what was asked for and keeps
+# gzip/brotli versions ready so we don't compress on every request.
+# Learning: ETags, HTTP caching, compression!
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from backend.core import config
+
+try:
+    import brotli  # optional - without it we just offer gzip
+except ImportError:
+    brotli = None
+
+# all sections that are in a structured file
+SECTIONS = ("current", "hourly", "daily_weekone", "daily_weektwo")
+DAILY_SECTIONS = ("daily_weekone", "daily_weektwo")
+
+# the slices the frontend asks for most, compressed for every location
+# right when new data arrives (everything else is compressed on demand)
+PRECOMPRESSED_FIELDS = (
+    SECTIONS,
+    ("current",),
+    ("hourly",),
+    ("daily_weekone",),
+    ("daily_weektwo",),
+    DAILY_SECTIONS,
+)
+
+_lock = threading.Lock()  # short: only for reading/swapping the data below
+_reload_lock = threading.Lock()  # only one thread loads + compresses new data at a time
+_version = None  # changes every time the files on disk change
+_last_check = 0.0
+_locations = {}  # plz -> parsed structured json
+_precompressed = {}  # (version, query) -> Body for PRECOMPRESSED_FIELDS, kept until the next refresh
+_bodies = OrderedDict()  # (version, query) -> Body made on demand, oldest first
+_postal_codes = None  # list of {"plz", "city"}
+_postal_codes_body = None
+
+
+class Body:
+    # one response, ready in every encoding we support
+    # fast=True is for bodies made while a request waits: cheap compression
+    # levels instead of the best ones we use once per data refresh
+    def __init__(self, data, fast=False):
+        self.identity = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        # strong etag = hash of the exact bytes, so it changes when the data changes
+        self.etag = '"' + hashlib.sha1(self.identity).hexdigest()[:20] + '"'
+        self.gzip = gzip.compress(self.identity, compresslevel=5 if fast else 9)
+        self.br = brotli.compress(self.identity, quality=4 if fast else 11) if brotli is not None else None
+
+    def etag_for(self, encoding: str) -> str:
+        # different bytes need a different strong etag, so add the encoding
+        if encoding == "identity":
+            return self.etag
+        return self.etag[:-1] + "-" + encoding + '"'
+
+    def all_etags(self) -> set:
+        return {self.etag_for(enc) for enc in ("identity", "gzip", "br")}
+
+    def content(self, encoding: str) -> bytes:
+        if encoding == "br":
+            return self.br
+        if encoding == "gzip":
+            return self.gzip
+        return self.identity
+
+
+# ---------- data version / refresh ----------
+
+def _scan_version() -> str:
+    # fingerprint of all structured files (name + modified time + size)
+    parts = []
+    directory = config.STRUCTURED_DATA_DIR
+    if directory.exists():
+        for path in sorted(directory.glob("*_structured.json")):
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:12]
+
+
+def _load(version: str):
+    # read every file and pre-compress the common slices of each location
+    # (slow with best compression, so this runs WITHOUT _lock - readers keep
+    # getting the old data meanwhile)
+    locations = {}
+    for path in sorted(config.STRUCTURED_DATA_DIR.glob("*_structured.json")):
+        plz = path.name.split("_")[0]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                locations[plz] = json.load(f)
+        except Exception as e:
+            print(f"Could not read {path.name}: {e}")  # skip broken files
+
+    precompressed = {}
+    for plz in locations:
+        for fields in PRECOMPRESSED_FIELDS:
+            data = _build(locations, version, [plz], fields, None, None)
+            precompressed[(version, (plz,), fields, None, None)] = Body(data)
+    return locations, precompressed
+
+
+def _refresh():
+    # load the files again if they changed, then swap the new data in
+    global _version, _locations, _precompressed
+    with _reload_lock:
+        version = _scan_version()
+        if version == _version:
+            return
+        locations, precompressed = _load(version)
+        with _lock:
+            _locations = locations
+            _precompressed = precompressed
+            _bodies.clear()
+            _version = version
+    print(f"Weather data version {version}: {len(precompressed)} answers pre-compressed")  # debug
+
+
+def _ensure_fresh():
+    # only look at the disk every few seconds, not on every request
+    global _last_check
+    with _lock:
+        now = time.monotonic()
+        if _version is not None and now - _last_check < config.WEATHER_DATA_CHECK_SECONDS:
+            return
+        _last_check = now
+    _refresh()
+
+
+def invalidate():
+    """Call after new weather data was written: loads and compresses it right away.
+
+    Takes a moment with many locations, so call it from a thread and not
+    from the event loop. /weather requests get the old data until it's done.
+    """
+    global _last_check
+    with _lock:
+        _last_check = time.monotonic()
+    _refresh()
+
+
+# ---------- building responses ----------
+
+def _in_range(date: str, from_date, to_date) -> bool:
+    # dates are "YYYY-MM-DD" so normal string compare works
+    if from_date and date < from_date:
+        return False
+    if to_date and date > to_date:
+        return False
+    return True
+
+
+def _build(all_locations: dict, version: str, plzs, fields, from_date, to_date) -> dict:
+    locations = {}
+    for plz in plzs:
+        data = all_locations.get(plz)
+        if data is None:
+            continue
+        selected = {}
+        for field in fields:
+            section = data.get(field, {})
+            if field in DAILY_SECTIONS and (from_date or to_date):
+                section = {day: v for day, v in section.items() if _in_range(day, from_date, to_date)}
+            selected[field] = section
+        locations[plz] = selected
+    return {
+        "version": version,
+        "locations": locations,
+        "missing": [plz for plz in plzs if plz not in all_locations],
+    }
+
+
+def _remember(key, body: Body):
+    _bodies[key] = body
+    _bodies.move_to_end(key)
+    while len(_bodies) > config.WEATHER_API_MAX_CACHED_BODIES:
+        _bodies.popitem(last=False)  # throw away the oldest one
+
+
+def get_weather(plzs: list, fields: tuple, from_date=None, to_date=None):
+    """Returns (Body, found_any) for the selected locations/fields/days."""
+    # same query in a different order = same response
+    key_plzs = tuple(sorted(set(plzs)))
+    _ensure_fresh()
+    with _lock:
+        key = (_version, key_plzs, tuple(fields), from_date, to_date)
+        found_any = any(plz in _locations for plz in key_plzs)
+        body = _precompressed.get(key) or _bodies.get(key)
+        if body is not None:
+            if key in _bodies:
+                _bodies.move_to_end(key)
+            return body, found_any
+        data = _build(_locations, _version, key_plzs, fields, from_date, to_date)
+
+    # compress outside the lock so other requests don't have to wait for us
+    body = Body(data, fast=True)
+    with _lock:
+        if key[0] == _version:
+            body = _bodies.setdefault(key, body)  # another request may have been faster
+            _remember(key, body)
+    return body, found_any
+
+
+# ---------- postal codes ----------
+
+class PostalCodesUnavailable(Exception):
+    # the postal codes file is missing or broken
+    pass
+
+
+def _load_postal_codes():
+    # the file never changes while the server runs, so load + compress it once
+    # (if it is missing we try again next time instead of remembering the error)
+    global _postal_codes, _postal_codes_body
+    if _postal_codes is not None:
+        return
+    try:
+        with open(config.POSTAL_CODES_FILE, "r", encoding="utf-8") as f:
+            postal_codes = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not load postal codes: {e}")
+        raise PostalCodesUnavailable(str(e))
+    _postal_codes_body = Body(postal_codes)
+    _postal_codes = postal_codes
+    print(f"Loaded {len(_postal_codes)} postal codes")  # debug
+
+
+def get_postal_codes(plz=None, city=None, city_prefix=None):
+    """Whole list (pre-compressed) or only the entries matching plz, city and/or city prefix.
+
+    Raises PostalCodesUnavailable if the file can't be read.
+    """
+    with _lock:
+        _load_postal_codes()
+        if plz is None and city is None and city_prefix is None:
+            return _postal_codes_body
+        city = city.lower() if city is not None else None
+        city_prefix = city_prefix.lower() if city_prefix is not None else None
+        matches = []
+        for entry in _postal_codes:
+            name = entry["city"].lower()
+            if plz is not None and entry["plz"] != plz:
+                continue
+            if city is not None and name != city:
+                continue
+            if city_prefix is not None and not name.startswith(city_prefix):
+                continue
+            matches.append(entry)
+            if len(matches) >= config.WEATHER_API_MAX_POSTAL_RESULTS:
+                break  # enough for a search box
+    return Body(matches, fast=True)
+
+
+# ---------- content negotiation ----------
+
+def pick_encoding(accept_encoding: str, body: Body) -> str:
+    """Best encoding the client accepts and we have: br, then gzip, then identity."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        pieces = part.strip().split(";")
+        name = pieces[0].strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in pieces[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+
+    def ok(name):
+        return accepted.get(name, accepted.get("*", 0.0)) > 0
+
+    if body.br is not None and ok("br"):
+        return "br"
+    if body.gzip is not None and ok("gzip"):
+        return "gzip"
+    return "identity"
@@ -0,0 +1,5 @@
+# makes "import backend..." work when running pytest from the project folder
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
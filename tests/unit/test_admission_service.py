@@ -0,0 +1,87 @@
+# Tests for the admission queue (backend/services/admission_service.py)
+
+import asyncio
+import hashlib
+
+import pytest
+
+from backend.services import admission_service
+from backend.services.admission_service import AdmissionController, QueueFullError
+
+
+def _controller(**kwargs):
+    settings = dict(max_concurrent=1, max_in_flight_per_tenant=1, max_queued_per_tenant=5,
+                    max_wait_seconds=120, default_job_seconds=30)
+    settings.update(kwargs)
+    return AdmissionController(**settings)
+
+
+async def _hold(controller, tenant, release, started, order):
+    async with controller.admit(tenant, "generate-documents"):
+        order.append(tenant)
+        started.set()
+        await release.wait()
+
+
+def test_spammer_does_not_lock_out_other_users():
+    async def scenario():
+        controller = _controller()
+        release = asyncio.Event()
+        order = []
+
+        # the spammer takes the slot and queues 4 more jobs (150s of work in total)
+        tasks = []
+        for _ in range(5):
+            tasks.append(asyncio.create_task(_hold(controller, "user:spam", release, asyncio.Event(), order)))
+        await asyncio.sleep(0)
+        assert controller.snapshot()["queued"] == 4
+
+        # the victim's first job goes in front of the spammer's queue
+        assert controller.estimate_wait() > controller.max_wait_seconds
+        victim_started = asyncio.Event()
+        tasks.append(asyncio.create_task(_hold(controller, "user:victim", release, victim_started, order)))
+        await asyncio.sleep(0)
+        assert controller.snapshot()["total_rejected"] == 0
+
+        release.set()
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(scenario())
+    assert order[:2] == ["user:spam", "user:victim"]
+
+
+def test_rejection_counter_is_kept_for_idle_tenant():
+    async def scenario():
+        controller = _controller(max_wait_seconds=10)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(controller, "user:a", release, asyncio.Event(), []))
+        await asyncio.sleep(0)
+
+        # 30s of work left on the running job is more than the 10s limit
+        with pytest.raises(QueueFullError) as error:
+            async with controller.admit("user:b", "generate-documents"):
+                pass
+        assert error.value.retry_after == 30
+
+        release.set()
+        await running
+        return controller.snapshot(reveal="user:b")
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["tenants"]["user:b"]["rejected"] == 1
+    # other tenants are only shown as hashes
+    assert "user:a" not in snapshot["tenants"]
+
+
+def test_explicit_zero_is_not_replaced_by_config():
+    controller = _controller(max_wait_seconds=0)
+    assert controller.max_wait_seconds == 0
+
+
+def test_hidden_tenant_labels_can_not_be_reversed_by_hashing():
+    label = admission_service._hide("user:1")
+    assert label == admission_service._hide("user:1")  # stable within one run
+    assert label != admission_service._hide("user:2")
+    # a plain hash of a guessed key must not match the label
+    assert label != "tenant-" + hashlib.sha256(b"user:1").hexdigest()[:10]
@@ -0,0 +1,72 @@
+# Tests for the flan-t5 prompt batching (backend/services/batch_scheduler.py)
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services.batch_scheduler import BatchScheduler
+
+
+class FakeGenerator:
+    # acts like the transformers pipeline: list of prompts in, one output per prompt
+    def __init__(self, error=None):
+        self.batch_sizes = []
+        self.error = error
+        self._lock = threading.Lock()
+
+    def __call__(self, texts, batch_size):
+        with self._lock:
+            self.batch_sizes.append(batch_size)
+        if self.error is not None:
+            raise self.error
+        return [[{"generated_text": f"report for {text}"}] for text in texts]
+
+
+def _submit_all(scheduler, texts):
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        futures = [pool.submit(scheduler.submit, text) for text in texts]
+        return [f.exception() or f.result() for f in futures]
+
+
+def test_concurrent_prompts_are_batched_and_get_their_own_result():
+    generator = FakeGenerator()
+    # long wait, so only a full batch (or the last, smaller one) is sent early
+    scheduler = BatchScheduler(lambda: generator, max_batch_size=4, max_wait_ms=500)
+    texts = [f"city {i}" for i in range(10)]
+
+    results = _submit_all(scheduler, texts)
+
+    assert results == [f"report for {text}" for text in texts]
+    assert generator.batch_sizes == [4, 4, 2]
+    assert scheduler.batches_run == 3 and scheduler.prompts_run == 10
+
+
+def test_batch_is_sent_after_max_wait():
+    generator = FakeGenerator()
+    scheduler = BatchScheduler(lambda: generator, max_batch_size=8, max_wait_ms=50)
+
+    start = time.monotonic()
+    assert scheduler.submit("Berlin") == "report for Berlin"
+    elapsed = time.monotonic() - start
+
+    # nobody else came, so the half empty batch goes out after ~50ms
+    assert generator.batch_sizes == [1]
+    assert 0.04 <= elapsed < 2
+
+
+def test_generator_error_reaches_every_caller_in_the_batch():
+    generator = FakeGenerator(error=RuntimeError("CUDA out of memory"))
+    scheduler = BatchScheduler(lambda: generator, max_batch_size=3, max_wait_ms=1000)
+
+    results = _submit_all(scheduler, ["Berlin", "Hamburg", "Passau"])
+
+    assert generator.batch_sizes == [3]
+    assert all(isinstance(r, RuntimeError) for r in results)
+    # the worker keeps running after a failed batch
+    generator.error = None
+    assert scheduler.submit("Berlin") == "report for Berlin"
+
+
+def test_batch_size_is_at_least_one():
+    scheduler = BatchScheduler(FakeGenerator, max_batch_size=0, max_wait_ms=10)
+    assert scheduler.max_batch_size == 1
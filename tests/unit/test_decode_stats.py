@@ -0,0 +1,91 @@
+# Tests for the decoding speed bookkeeping (backend/services/decode_stats.py)
+
+from backend.services import decode_stats
+from backend.services.decode_stats import DecodeStats
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+
+class FakeModel:
+    # acts like llama_cpp: reads the prompt (prefill), then every step asks the
+    # draft for tokens and outputs its own token + the accepted draft tokens
+    def __init__(self, clock, stats, steps, prefill_seconds, token_seconds, proposed=3):
+        self.clock = clock
+        self.stats = stats
+        self.steps = steps  # tokens per step, like [1, 4, 2, 3]
+        self.prefill_seconds = prefill_seconds
+        self.token_seconds = token_seconds
+        self.proposed = proposed
+
+    def __call__(self, prompt, stopping_criteria=None, **kwargs):
+        self.clock.now += self.prefill_seconds
+        for tokens in self.steps:
+            self.stats.count_draft(self.proposed)  # the drafter
+            for _ in range(tokens):
+                self.clock.now += self.token_seconds
+                assert stopping_criteria(None, None) is False  # never stops the model
+        return {"usage": {"completion_tokens": sum(self.steps)}, "choices": [{"text": "Sonne in Berlin."}]}
+
+
+def test_prefill_is_not_counted_as_decode_time(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(decode_stats, "time", clock)
+    stats = DecodeStats()
+    model = FakeModel(clock, stats, steps=[1, 4, 2, 3], prefill_seconds=2.0, token_seconds=0.1)
+
+    output = stats.measure(model, "long prompt", max_tokens=500)
+    snapshot = stats.snapshot()
+
+    assert output["choices"][0]["text"] == "Sonne in Berlin."
+    assert snapshot["calls"] == 1
+    assert snapshot["completion_tokens"] == 10
+    # prefill ends with the first token, the other 9 tokens are the decode part
+    assert abs(snapshot["prefill_seconds"] - 2.1) < 1e-9
+    assert snapshot["decode_tokens"] == 9
+    assert abs(snapshot["decode_seconds"] - 0.9) < 1e-9
+    assert snapshot["decode_tokens_per_sec"] == 10.0
+
+
+def test_acceptance_rate_and_reset(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(decode_stats, "time", clock)
+    stats = DecodeStats()
+    model = FakeModel(clock, stats, steps=[1, 4, 2, 3], prefill_seconds=1.0, token_seconds=0.1)
+
+    stats.measure(model, "prompt")
+    snapshot = stats.snapshot()
+    # 4 steps with 3 proposed tokens each, 10 tokens = 4 own tokens + 6 accepted
+    assert snapshot["draft_calls"] == 4
+    assert snapshot["proposed_tokens"] == 12
+    assert snapshot["accepted_tokens"] == 6
+    assert snapshot["acceptance_rate"] == 0.5
+
+    stats.reset()
+    snapshot = stats.snapshot()
+    assert snapshot["calls"] == 0 and snapshot["decode_tokens_per_sec"] == 0.0
+    assert snapshot["acceptance_rate"] == 0.0
+
+
+def test_no_draft_means_nothing_accepted(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(decode_stats, "time", clock)
+    stats = DecodeStats()
+
+    class GreedyModel(FakeModel):
+        def __call__(self, prompt, stopping_criteria=None, **kwargs):
+            self.clock.now += self.prefill_seconds
+            for _ in range(5):
+                self.clock.now += self.token_seconds
+                stopping_criteria(None, None)
+            return {"usage": {"completion_tokens": 5}, "choices": [{"text": "Regen."}]}
+
+    stats.measure(GreedyModel(clock, stats, [], prefill_seconds=1.0, token_seconds=0.25), "prompt")
+    snapshot = stats.snapshot()
+    assert snapshot["accepted_tokens"] == 0 and snapshot["proposed_tokens"] == 0
+    assert snapshot["decode_tokens_per_sec"] == 4.0
@@ -0,0 +1,81 @@
+# Tests for the pre-warm bookkeeping (backend/services/prewarm_service.py)
+
+import pytest
+
+from backend.core import config
+from backend.services import prewarm_service
+
+SPEC = {"cities": ["Berlin"], "zipcodes": ["10115"], "person": "Merkel", "hobbies": [], "language": "de"}
+HAMBURG = {"cities": ["Hamburg"], "zipcodes": ["20095"], "person": "Fisch", "hobbies": [], "language": "en"}
+
+
+@pytest.fixture(autouse=True)
+def clean_state(tmp_path, monkeypatch):
+    # never touch the real data/history file and start every test from zero
+    monkeypatch.setattr(config, "PREWARM_HISTORY_FILE", tmp_path / "request_history.json")
+    monkeypatch.setattr(prewarm_service, "_history", {})
+    monkeypatch.setattr(prewarm_service, "_history_loaded", False)
+    monkeypatch.setattr(prewarm_service, "_history_dirty", False)
+    monkeypatch.setattr(prewarm_service, "_last_save", 0.0)
+    monkeypatch.setattr(prewarm_service, "_prewarmed_keys", set())
+    monkeypatch.setattr(prewarm_service, "_unwritten_keys", set())
+    monkeypatch.setattr(prewarm_service, "_stats", {key: 0 for key in prewarm_service._stats})
+
+
+def test_every_hit_on_a_prewarmed_report_is_counted(monkeypatch):
+    monkeypatch.setattr(config, "PREWARM_PEAK_HOURS", (0, 24))
+    prewarm_service.mark_prewarmed("berlin")
+
+    for _ in range(50):
+        prewarm_service.record_request("berlin", SPEC, cache_hit=True)
+        # the first hit writes the text file, that must not end the "pre-warmed" state
+        prewarm_service.file_written("berlin")
+
+    assert prewarm_service._stats["peak_prewarmed_hits"] == 50
+    assert not prewarm_service.needs_file_write("berlin")
+
+    # a normal regeneration means the entry is not pre-warmed anymore
+    prewarm_service.forget_prewarmed("berlin")
+    prewarm_service.record_request("berlin", SPEC, cache_hit=True)
+    assert prewarm_service._stats["prewarmed_hits"] == 50
+
+
+def test_peak_hours_over_midnight(monkeypatch):
+    monkeypatch.setattr(config, "PREWARM_PEAK_HOURS", (22, 2))
+    assert prewarm_service._is_peak_hour(23)
+    assert prewarm_service._is_peak_hour(1)
+    assert not prewarm_service._is_peak_hour(2)
+    assert not prewarm_service._is_peak_hour(12)
+
+
+def test_broken_peak_hours_fall_back_to_default():
+    assert config._parse_hour_range("7", (6, 10)) == (6, 10)
+    assert config._parse_hour_range("22-2", (6, 10)) == (22, 2)
+
+
+def test_only_missing_or_outdated_reports_are_prewarmed():
+    cached = {"berlin", "hamburg"}
+    # Berlin got new weather, Hamburg didn't
+    refreshed = prewarm_service._spec_places({"cities": ["berlin"], "zipcodes": ["10115"]})
+    assert prewarm_service._needs_prewarm("berlin", SPEC, cached, refreshed)
+    assert not prewarm_service._needs_prewarm("hamburg", HAMBURG, cached, refreshed)
+    assert prewarm_service._needs_prewarm("new", HAMBURG, cached, refreshed)
+    # the report the refreshing request just wrote is already fresh
+    assert not prewarm_service._needs_prewarm("berlin", SPEC, cached, refreshed, fresh_key="berlin")
+    # unknown refresh (scheduler) -> every cached report may be old
+    assert prewarm_service._needs_prewarm("hamburg", HAMBURG, cached, None)
+
+
+def test_history_save_is_throttled(monkeypatch):
+    monkeypatch.setattr(config, "PREWARM_HISTORY_SAVE_SECONDS", 300)
+    path = config.PREWARM_HISTORY_FILE
+    prewarm_service.record_request("berlin", SPEC, cache_hit=False)
+    prewarm_service.save_history()
+    assert "berlin" in path.read_text(encoding="utf-8")
+
+    # too soon for a normal save, but shutdown (force) still writes
+    prewarm_service.record_request("hamburg", HAMBURG, cache_hit=False)
+    prewarm_service.save_history()
+    assert "hamburg" not in path.read_text(encoding="utf-8")
+    prewarm_service.save_history(force=True)
+    assert "hamburg" in path.read_text(encoding="utf-8")
@@ -0,0 +1,80 @@
+# Tests for the /weather data service (backend/services/weather_data_service.py)
+
+import json
+
+import pytest
+
+from backend.core import config
+from backend.services import weather_data_service as weather_data
+
+STRUCTURED = {
+    "current": {"temperature": 2, "overcast": "clear"},
+    "hourly": {"1": {"temperature": 0}},
+    "daily_weekone": {"2026-01-01": {"maxtemp": 2}, "2026-01-02": {"maxtemp": 1}},
+    "daily_weektwo": {"2026-01-08": {"maxtemp": 3}},
+}
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    (tmp_path / "10115_structured.json").write_text(json.dumps(STRUCTURED), encoding="utf-8")
+    monkeypatch.setattr(config, "STRUCTURED_DATA_DIR", tmp_path)
+    monkeypatch.setattr(config, "POSTAL_CODES_FILE", tmp_path / "postal_codes.json")
+    monkeypatch.setattr(weather_data, "_version", None)
+    monkeypatch.setattr(weather_data, "_postal_codes", None)
+    monkeypatch.setattr(weather_data, "_postal_codes_body", None)
+    return tmp_path
+
+
+def test_common_slices_are_precompressed(data_dir):
+    body, found = weather_data.get_weather(["10115"], ("current",))
+    assert found
+    assert body is weather_data._precompressed[(weather_data._version, ("10115",), ("current",), None, None)]
+    assert json.loads(body.identity)["locations"]["10115"] == {"current": STRUCTURED["current"]}
+
+
+def test_day_range_is_built_on_demand(data_dir):
+    body, _ = weather_data.get_weather(["10115"], weather_data.DAILY_SECTIONS, "2026-01-02", None)
+    data = json.loads(body.identity)["locations"]["10115"]
+    assert list(data["daily_weekone"]) == ["2026-01-02"]
+    assert body.gzip is not None
+    # the same query again is served from the cache
+    assert weather_data.get_weather(["10115"], weather_data.DAILY_SECTIONS, "2026-01-02", None)[0] is body
+
+
+def test_missing_postal_codes_file(data_dir):
+    with pytest.raises(weather_data.PostalCodesUnavailable):
+        weather_data.get_postal_codes()
+
+
+def test_postal_codes_city_prefix(data_dir):
+    entries = [{"plz": "10115", "city": "Berlin"}, {"plz": "28195", "city": "Bremen"}, {"plz": "80331", "city": "München"}]
+    (data_dir / "postal_codes.json").write_text(json.dumps(entries), encoding="utf-8")
+    body = weather_data.get_postal_codes(city_prefix="b")
+    assert [e["city"] for e in json.loads(body.identity)] == ["Berlin", "Bremen"]
+    body = weather_data.get_postal_codes(city="berlin")
+    assert json.loads(body.identity) == [entries[0]]
+
+
+def test_invalidate_compresses_new_data_without_blocking_readers(data_dir, monkeypatch):
+    weather_data.get_weather(["10115"], ("current",))
+    old_version = weather_data._version
+
+    # best-level compression of the new data must not hold the reader lock
+    held = []
+    real_body = weather_data.Body
+
+    def checking_body(data, fast=False):
+        held.append(weather_data._lock.locked())
+        return real_body(data, fast)
+
+    monkeypatch.setattr(weather_data, "Body", checking_body)
+    changed = dict(STRUCTURED, current={"temperature": 5, "overcast": "cloudy"})
+    (data_dir / "20095_structured.json").write_text(json.dumps(changed), encoding="utf-8")
+    weather_data.invalidate()
+
+    assert held and not any(held)
+    assert weather_data._version != old_version
+    # the next reader finds everything ready
+    body, found = weather_data.get_weather(["20095"], ("current",))
+    assert found and body is weather_data._precompressed[(weather_data._version, ("20095",), ("current",), None, None)]